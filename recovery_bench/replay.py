@@ -16,7 +16,7 @@ from pathlib import Path
 
 from harbor.environments.base import BaseEnvironment
 
-from recovery_bench.utils import find_trajectory_folder
+from recovery_bench.utils import find_trajectory_file, find_trajectory_folder
 
 logger = logging.getLogger(__name__)
 
@@ -35,22 +35,10 @@ class ReplayCommand:
 # ---------------------------------------------------------------------------
 
 
-def _find_trajectory_file(trajectory_folder: Path) -> Path | None:
-    """Locate the trajectory.json inside a trajectory folder."""
-    for path in [
-        trajectory_folder / "agent" / "trajectory.json",
-        trajectory_folder / "trajectory.json",
-    ]:
-        if path.exists():
-            return path
-    return None
-
-
 def _load_trajectory(trajectory_file: Path) -> list[dict]:
     """Load and return the steps from a trajectory file."""
     try:
-        with open(trajectory_file, "r") as f:
-            trajectory = json.load(f)
+        trajectory = json.loads(trajectory_file.read_bytes())
     except (json.JSONDecodeError, FileNotFoundError):
         logger.error(f"Failed to read trajectory: {trajectory_file}")
         return []
@@ -113,35 +101,46 @@ def _extract_from_step(step: dict) -> tuple[list[ReplayCommand], dict | None]:
     return commands, message
 
 
-def extract_commands(trajectory_folder: Path) -> list[ReplayCommand]:
-    """Parse ATIF trajectory and extract replay commands."""
-    trajectory_file = _find_trajectory_file(trajectory_folder)
-    if not trajectory_file:
-        return []
-
-    steps = _load_trajectory(trajectory_file)
+def _extract_from_steps(steps: list[dict]) -> tuple[list[ReplayCommand], list[dict]]:
+    """Collect replay commands and chat messages from all steps in one pass."""
     commands: list[ReplayCommand] = []
+    messages: list[dict] = []
     for step in steps:
-        step_commands, _ = _extract_from_step(step)
+        step_commands, message = _extract_from_step(step)
         commands.extend(step_commands)
+        if message:
+            messages.append(message)
+    return commands, messages
 
+
+def parse_trajectory(trajectory_folder: Path) -> tuple[list[ReplayCommand], list[dict]]:
+    """Parse ATIF trajectory once and return (commands, messages).
+
+    Callers that need both should use this rather than extract_commands +
+    extract_messages, which would each load and walk the file.
+    """
+    trajectory_file = find_trajectory_file(trajectory_folder)
+    if not trajectory_file:
+        return [], []
+
+    commands, messages = _extract_from_steps(_load_trajectory(trajectory_file))
     logger.info(f"Extracted {len(commands)} commands from {trajectory_file}")
+    return commands, messages
+
+
+def extract_commands(trajectory_folder: Path) -> list[ReplayCommand]:
+    """Parse ATIF trajectory and extract replay commands."""
+    commands, _ = parse_trajectory(trajectory_folder)
     return commands
 
 
 def extract_messages(trajectory_folder: Path) -> list[dict]:
     """Extract chat messages from trajectory for context injection."""
-    trajectory_file = _find_trajectory_file(trajectory_folder)
+    trajectory_file = find_trajectory_file(trajectory_folder)
     if not trajectory_file:
         return []
 
-    steps = _load_trajectory(trajectory_file)
-    messages: list[dict] = []
-    for step in steps:
-        _, message = _extract_from_step(step)
-        if message:
-            messages.append(message)
-
+    _, messages = _extract_from_steps(_load_trajectory(trajectory_file))
     return messages
 
 
@@ -151,12 +150,12 @@ def find_and_parse_trajectory(
 ) -> tuple[list[ReplayCommand], list[dict]]:
     """Find trajectory folder for task, parse it, return (commands, messages).
 
-    Convenience function that combines find_trajectory_folder + extraction.
+    Convenience function that combines find_trajectory_folder + parse_trajectory.
     """
     folder = find_trajectory_folder(logs_dir, base_folder)
     if folder is None:
         return [], []
-    return extract_commands(folder), extract_messages(folder)
+    return parse_trajectory(folder)
 
 
 # ---------------------------------------------------------------------------
@@ -1,9 +1,13 @@
+import errno
+import functools
 import hashlib
 import json
 import logging
 import os
+import re
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
@@ -16,6 +20,25 @@ from litellm.types.utils import (
 
 logger = logging.getLogger(__name__)
 
+# Directory prefix added by reorganize_directories: 8 hex chars + dash.
+_HASH_PREFIX_RE = re.compile(r"[0-9a-fA-F]{8}-")
+
+# Positions before each non-leading capital, for CamelCase -> kebab-case.
+_CAMEL_CASE_BOUNDARY_RE = re.compile(r"(?<!^)(?=[A-Z])")
+
+# Terminus-2's first prompt wraps the task instruction between these markers.
+_TASK_DESCRIPTION_MARKER = "Task Description:\n"
+_TERMINAL_STATE_MARKER = "\n\nCurrent terminal state:"
+
+# Where a trial directory may hold its ATIF trajectory, in lookup order.
+_TRAJECTORY_RELPATHS = ("agent/trajectory.json", "trajectory.json")
+
+# Errnos Path.exists() reports as "missing" rather than raising.
+_MISSING_PATH_ERRNOS = frozenset({errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP})
+
+# Threads used by reorganize_directories to read trajectories concurrently.
+REORGANIZE_MAX_WORKERS = 8
+
 
 def resolve_config(model_str: str) -> tuple[str, dict]:
     """Resolve a model string to (model_name, agent_kwargs).
@@ -48,29 +71,28 @@ def shorten_model_name(model: str) -> str:
     return model.split("/")[-1]
 
 
+@functools.lru_cache(maxsize=4096)
 def create_task_hash(task_description: str) -> str:
-    """Create 8-character hash from task description."""
-    return hashlib.sha256(task_description.encode("utf-8")).hexdigest()[:8]
+    """Create 8-character hash from task description.
 
+    Memoized since the same instruction recurs across trials of a task.
+    """
+    return hashlib.sha256(task_description.encode("utf-8"), usedforsecurity=False).hexdigest()[:8]
 
 
 def get_unsolved_tasks(logs_dir: str, print_output: bool = False) -> List[str]:
     """Get list of unsolved task IDs from a logs directory."""
-    logs_dir = Path(logs_dir)
     unsolved_ids = []
 
-    for task_id in os.listdir(logs_dir):
-        task_dir = logs_dir / task_id
-        if not task_dir.is_dir():
-            continue
-
-        results_file = task_dir / "result.json"
-        if not results_file.exists():
-            continue
+    # Plain (name, path) strings: no Path objects are needed in this loop.
+    with os.scandir(logs_dir) as entries:
+        task_dirs = [(e.name, e.path) for e in entries if e.is_dir()]
 
+    for task_id, task_dir in task_dirs:
+        # No exists() pre-check: a missing result.json raises FileNotFoundError
         try:
-            with open(results_file, "r") as f:
-                results = json.load(f)
+            with open(os.path.join(task_dir, "result.json"), "rb") as f:
+                results = json.loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
             continue
 
@@ -96,25 +118,27 @@ def get_unsolved_tasks(logs_dir: str, print_output: bool = False) -> List[str]:
 
 def is_hash_prefixed_directory(task_name: str) -> bool:
     """Check if directory name starts with an 8-char hex hash prefix."""
-    if len(task_name) > 9 and task_name[8] == "-":
-        hash_part = task_name[:8]
-        if all(c in "0123456789abcdef" for c in hash_part.lower()):
-            return True
-    return False
+    return len(task_name) > 9 and _HASH_PREFIX_RE.match(task_name) is not None
+
+
+def find_trajectory_file(task_dir: Path) -> Path | None:
+    """Locate the trajectory.json inside a task directory.
+
+    Checks ``agent/trajectory.json`` then ``trajectory.json``, stopping at
+    the first that exists.
+    """
+    candidates = (task_dir / relpath for relpath in _TRAJECTORY_RELPATHS)
+    return next((path for path in candidates if path.exists()), None)
 
 
 def extract_instruction_from_trajectory(task_dir: Path) -> str | None:
     """Extract instruction from an ATIF trajectory.json in a task directory."""
-    agent_dir = task_dir / "agent"
-    trajectory_file = agent_dir / "trajectory.json" if agent_dir.exists() else None
-    if not trajectory_file or not trajectory_file.exists():
-        trajectory_file = task_dir / "trajectory.json"
-    if not trajectory_file or not trajectory_file.exists():
+    trajectory_file = find_trajectory_file(task_dir)
+    if not trajectory_file:
         return None
 
     try:
-        with open(trajectory_file, "r") as f:
-            trajectory = json.load(f)
+        trajectory = json.loads(trajectory_file.read_bytes())
 
         full_message = None
 
@@ -135,15 +159,11 @@ def extract_instruction_from_trajectory(task_dir: Path) -> str | None:
         if not full_message:
             return None
 
-        # Strip terminus-2 system prompt - task description comes after "Task Description:\n"
-        task_marker = "Task Description:\n"
-        if task_marker in full_message:
-            task_part = full_message.split(task_marker, 1)[1]
+        # Strip terminus-2 system prompt - task description comes after the marker
+        _, marker, task_part = full_message.partition(_TASK_DESCRIPTION_MARKER)
+        if marker:
             # Also strip the "Current terminal state:" suffix if present
-            terminal_marker = "\n\nCurrent terminal state:"
-            if terminal_marker in task_part:
-                task_part = task_part.split(terminal_marker, 1)[0]
-            return task_part
+            return task_part.partition(_TERMINAL_STATE_MARKER)[0]
 
         return full_message
     except (json.JSONDecodeError, FileNotFoundError):
@@ -160,35 +180,49 @@ def reorganize_directories(base_path: str) -> None:
         return
 
     task_to_hash = {}
-
-    for task_dir in base_path.iterdir():
-        if not task_dir.is_dir():
-            continue
-
-        task_name = task_dir.name
-
-        if is_hash_prefixed_directory(task_name):
-            logger.debug(f"  {task_name} -> SKIPPED (already has hash prefix)")
-            continue
-
-        instruction = extract_instruction_from_trajectory(task_dir)
-        if instruction:
-            task_hash = create_task_hash(instruction)
-            task_to_hash[task_dir] = task_hash
-            logger.debug(f"  {task_name} -> {task_hash}")
-        else:
-            logger.debug(f"  {task_name} -> SKIPPED (no trajectory.json or instruction)")
+    pending: list[Path] = []
+
+    # Single scandir pass: d_type answers is_dir() without a stat per entry.
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            if is_hash_prefixed_directory(entry.name):
+                logger.debug(f"  {entry.name} -> SKIPPED (already has hash prefix)")
+                continue
+            pending.append(Path(entry.path))
+
+    # Trajectory reads are I/O-bound, so overlap them across directories.
+    with ThreadPoolExecutor(max_workers=REORGANIZE_MAX_WORKERS) as executor:
+        instructions = executor.map(extract_instruction_from_trajectory, pending)
+        for task_dir, instruction in zip(pending, instructions):
+            task_name = task_dir.name
+            if instruction:
+                task_hash = create_task_hash(instruction)
+                task_to_hash[task_dir] = task_hash
+                logger.debug(f"  {task_name} -> {task_hash}")
+            else:
+                logger.debug(f"  {task_name} -> SKIPPED (no trajectory.json or instruction)")
 
     for task_dir, task_hash in task_to_hash.items():
         task_name = task_dir.name
         new_task_dir = task_dir.parent / f"{task_hash}-{task_name}"
 
         try:
-            shutil.move(str(task_dir), str(new_task_dir))
+            # Siblings share a filesystem, so a plain rename is one syscall;
+            # shutil.move's copy fallback is only needed across devices.
+            try:
+                os.replace(task_dir, new_task_dir)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(str(task_dir), str(new_task_dir))
             logger.debug(f"    Renamed to {task_hash}-{task_name}")
         except Exception as e:
             logger.error(f"    Error renaming {task_dir}: {e}")
 
+    # Renames may land within the same mtime tick; drop cached scans explicitly.
+    _index_trajectory_dirs.cache_clear()
     logger.info(f"Processed {len(task_to_hash)} tasks")
 
 
@@ -206,10 +240,35 @@ def get_task_name(logs_dir: str | Path | None) -> str | None:
     return task_dir_name
 
 
+@functools.lru_cache(maxsize=16)
+def _index_trajectory_dirs(base_folder: str, mtime_ns: int) -> dict[str, tuple[str, ...]]:
+    """Map plain task names to their trial directories under ``base_folder``.
+
+    Cached per ``(base_folder, mtime_ns)`` so a traces directory is scanned
+    once rather than once per task; adding or renaming trial directories
+    bumps the mtime and invalidates the entry.
+    """
+    index: dict[str, list[str]] = {}
+    with os.scandir(base_folder) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            # Dir format: <hash>-<task-name>__<suffix>
+            dir_task = entry.name
+            # Strip hash prefix (8 hex chars + dash)
+            if is_hash_prefixed_directory(dir_task):
+                dir_task = dir_task[9:]
+            # Strip __suffix
+            if "__" in dir_task:
+                dir_task = dir_task.rsplit("__", 1)[0]
+            index.setdefault(dir_task, []).append(entry.path)
+    return {name: tuple(dirs) for name, dirs in index.items()}
+
+
 def find_trajectory_by_name(task_name: str, base_folder: str | Path) -> Path | None:
     """Find the trajectory folder for a task name in a traces directory.
 
-    Scans ``base_folder`` for directories matching ``<hash>-<task-name>__<suffix>``
+    Looks up ``base_folder`` for directories matching ``<hash>-<task-name>__<suffix>``
     or ``<task-name>__<suffix>`` and returns the first one containing a
     ``trajectory.json``.
 
@@ -221,29 +280,19 @@ def find_trajectory_by_name(task_name: str, base_folder: str | Path) -> Path | N
         Path to the matching trajectory folder, or None if not found.
     """
     base_path = Path(base_folder)
-    if not base_path.exists():
+    try:
+        mtime_ns = base_path.stat().st_mtime_ns
+    except OSError as e:
+        if e.errno not in _MISSING_PATH_ERRNOS:
+            raise
         logger.warning(f"Trajectory folder not found: {base_path}")
         return None
 
-    for item in base_path.iterdir():
-        if not item.is_dir():
-            continue
-        # Dir format: <hash>-<task-name>__<suffix>
-        dir_name = item.name
-        # Strip hash prefix (8 hex chars + dash)
-        if len(dir_name) > 9 and dir_name[8] == "-":
-            dir_task = dir_name[9:]
-        else:
-            dir_task = dir_name
-        # Strip __suffix
-        if "__" in dir_task:
-            dir_task = dir_task.rsplit("__", 1)[0]
-
-        if dir_task == task_name:
-            for traj_path in [item / "agent" / "trajectory.json", item / "trajectory.json"]:
-                if traj_path.exists():
-                    logger.debug(f"Found trajectory for task {task_name}: {item}")
-                    return item
+    for dir_path in _index_trajectory_dirs(str(base_path), mtime_ns).get(task_name, ()):
+        item = Path(dir_path)
+        if find_trajectory_file(item):
+            logger.debug(f"Found trajectory for task {task_name}: {item}")
+            return item
 
     logger.warning(f"No trajectory found for task {task_name} in {base_path}")
     return None
@@ -288,16 +337,15 @@ def get_agent_name(agent_import_path: str) -> str:
         return cls.name()
     except Exception:
         # Fallback: convert CamelCase to kebab-case
-        import re
-
-        return re.sub(r"(?<!^)(?=[A-Z])", "-", class_name).lower()
+        return _CAMEL_CASE_BOUNDARY_RE.sub("-", class_name).lower()
 
 
 def run_command(cmd: List[str], env: dict = None, cwd: str = None):
-    """Run a command and return the result."""
+    """Run a command and return the result.
+
+    ``env=None`` inherits the parent environment without copying it.
+    """
     logger.info(f"Running: {' '.join(cmd)}")
-    if env is None:
-        env = os.environ.copy()
 
     result = subprocess.run(cmd, env=env, cwd=cwd, capture_output=False, text=True)
     if result.returncode != 0:
@@ -397,19 +445,17 @@ def aggregate_usage(job_dir: str) -> dict:
     totals: dict = {k: 0 if k != "cost_usd" else 0.0 for k in _USAGE_AGGREGATE_KEYS}
     task_count = 0
 
-    for task_dir in sorted(job_path.iterdir()):
-        if not task_dir.is_dir():
-            continue
-        usage_file = task_dir / "usage.json"
-        if not usage_file.exists():
-            continue
+    with os.scandir(job_path) as entries:
+        task_dirs = sorted(e.path for e in entries if e.is_dir())
+
+    for task_dir in task_dirs:
         try:
-            with open(usage_file) as f:
-                usage = json.load(f)
+            with open(os.path.join(task_dir, "usage.json"), "rb") as f:
+                usage = json.loads(f.read())
             for key in _USAGE_AGGREGATE_KEYS:
                 totals[key] += usage.get(key, 0)
             task_count += 1
-        except (json.JSONDecodeError, KeyError):
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
             continue
 
     totals["cost_usd"] = round(totals["cost_usd"], 6)